@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark "best spot near me" queries across location counts.
+Run from the repo root: python benchmarks/bench_spatial.py
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from aethersense.spatial import Location, SpatialIndex, haversine_km
+
+# Rough Europe bounding box (MVP scope)
+LAT_RANGE = (36.0, 70.0)
+LON_RANGE = (-10.0, 30.0)
+WINDOWS = [f"2025-10-{day:02d}T{hour:02d}" for day in (25, 26) for hour in range(6, 20, 2)]
+QUERIES = 200
+RADIUS_KM = 100.0
+
+
+def make_dataset(count, rng):
+    locations = [
+        Location(id=f"loc-{i}", name=f"Spot {i}", lat=rng.uniform(*LAT_RANGE), lon=rng.uniform(*LON_RANGE))
+        for i in range(count)
+    ]
+    scores = {loc.id: {w: rng.uniform(0, 100) for w in WINDOWS} for loc in locations}
+    return locations, scores
+
+
+def brute_force(locations, scores, lat, lon, k):
+    ranked = []
+    for loc in locations:
+        distance = haversine_km(lat, lon, loc.lat, loc.lon)
+        if distance <= RADIUS_KM:
+            for window, score in scores[loc.id].items():
+                ranked.append((score, -distance, loc.id, window))
+    ranked.sort(reverse=True)
+    return ranked[:k]
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'locations':>10} {'build ms':>10} {'index ms/q':>11} {'brute ms/q':>11} {'knn ms/q':>9}")
+    for count in (1_000, 5_000, 20_000, 100_000):
+        locations, scores = make_dataset(count, rng)
+        points = [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for _ in range(QUERIES)]
+
+        start = time.perf_counter()
+        index = SpatialIndex(locations)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        results = [index.best_spots(lat, lon, RADIUS_KM, scores, k=5) for lat, lon in points]
+        index_ms = (time.perf_counter() - start) * 1000 / QUERIES
+
+        start = time.perf_counter()
+        for lat, lon in points:
+            index.nearest(lat, lon, k=10)
+        knn_ms = (time.perf_counter() - start) * 1000 / QUERIES
+
+        start = time.perf_counter()
+        expected = [brute_force(locations, scores, lat, lon, 5) for lat, lon in points]
+        brute_ms = (time.perf_counter() - start) * 1000 / QUERIES
+
+        for got, want in zip(results, expected):
+            assert [(s.location.id, s.window) for s in got] == [(e[2], e[3]) for e in want]
+
+        print(f"{count:>10} {build_ms:>10.1f} {index_ms:>11.3f} {brute_ms:>11.3f} {knn_ms:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ import requests
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Generator, Optional, Tuple
 import re
+import time
 from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
@@ -11,6 +12,8 @@ from pydantic import BaseModel
 from dotenv import load_dotenv
 from openai import OpenAI
 
+from trace_log import Trace, from_env as trace_logger_from_env
+
 """
 
 
@@ -26,6 +29,7 @@ Environment Variables:
 - OPENAI_MODEL: Default OpenAI model
 - NASA_API_KEY: NASA API key (get from https://api.nasa.gov/)
 - PORT: Server port (default: 8000)
+- TRACE_LOG_PATH / TRACE_SAMPLE_RATE / TRACE_QUEUE_SIZE: Query/trace log (see trace_log.py)
 """
 
 load_dotenv()
@@ -58,6 +62,19 @@ NASA_BASE_URL = "https://api.nasa.gov"
 DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "gpt-5")
 PORT = int(os.getenv("PORT", "8000"))  # Default to 8000 for consistency
 
+# Query/trace log (background batch writer, never blocks request handlers)
+trace_logger = trace_logger_from_env()
+
+
+@app.on_event("startup")
+def start_trace_logger():
+    trace_logger.start()
+
+
+@app.on_event("shutdown")
+def stop_trace_logger():
+    trace_logger.stop()
+
 
 # ---------------- Pydantic Models ----------------
 
@@ -197,7 +214,7 @@ def extract_space_keywords(message: str) -> List[str]:
     return found_keywords
 
 
-def enhance_prompt_with_nasa_data(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def enhance_prompt_with_nasa_data(messages: List[Dict[str, Any]], trace: Trace) -> List[Dict[str, Any]]:
     """Enhance the conversation with REAL NASA data context."""
     try:
         # Get the last user message
@@ -214,51 +231,50 @@ def enhance_prompt_with_nasa_data(messages: List[Dict[str, Any]]) -> List[Dict[s
         space_keywords = extract_space_keywords(user_message)
         
         if space_keywords:
-            print(f"🛰️ Detected space keywords: {space_keywords}")
+            trace.intents = space_keywords
             
             # Actually fetch NASA data based on keywords
             nasa_data = {}
             
             # Get Astronomy Picture of the Day
             if any(keyword in ["space", "astronomy", "cosmos", "universe", "star", "galaxy"] for keyword in space_keywords):
-                print("📸 Fetching APOD...")
-                apod_data = get_nasa_apod()
+                with trace.stage("nasa_apod"):
+                    apod_data = get_nasa_apod()
                 if "error" not in apod_data:
                     nasa_data["apod"] = apod_data
-                    print(f"✅ APOD: {apod_data.get('title', 'N/A')}")
+                    trace.source("apod")
                 else:
-                    print(f"❌ APOD error: {apod_data['error']}")
+                    trace.event(f"apod error: {apod_data['error']}")
             
             # Get Near Earth Objects
             if any(keyword in ["asteroid", "comet", "neo", "earth", "orbit"] for keyword in space_keywords):
-                print("🌍 Fetching NEO data...")
-                neo_data = get_nasa_neo_today()
+                with trace.stage("nasa_neo"):
+                    neo_data = get_nasa_neo_today()
                 if "error" not in neo_data:
                     nasa_data["neo"] = neo_data
-                    neo_count = neo_data.get("element_count", 0)
-                    print(f"✅ NEO: {neo_count} objects today")
+                    trace.source("neo")
                 else:
-                    print(f"❌ NEO error: {neo_data['error']}")
+                    trace.event(f"neo error: {neo_data['error']}")
             
             # Get Mars Weather
             if any(keyword in ["mars", "weather", "planet"] for keyword in space_keywords):
-                print("🔴 Fetching Mars weather...")
-                mars_data = get_nasa_mars_weather()
+                with trace.stage("nasa_mars_weather"):
+                    mars_data = get_nasa_mars_weather()
                 if "error" not in mars_data:
                     nasa_data["mars_weather"] = mars_data
-                    print(f"✅ Mars weather: Available")
+                    trace.source("mars_weather")
                 else:
-                    print(f"❌ Mars weather error: {mars_data['error']}")
+                    trace.event(f"mars_weather error: {mars_data['error']}")
             
             # Get Space Weather
             if any(keyword in ["space weather", "solar", "sun", "weather"] for keyword in space_keywords):
-                print("⚡ Fetching space weather...")
-                space_weather = get_space_weather_alerts()
+                with trace.stage("nasa_space_weather"):
+                    space_weather = get_space_weather_alerts()
                 if "error" not in space_weather:
                     nasa_data["space_weather"] = space_weather
-                    print(f"✅ Space weather: Available")
+                    trace.source("space_weather")
                 else:
-                    print(f"❌ Space weather error: {space_weather['error']}")
+                    trace.event(f"space_weather error: {space_weather['error']}")
             
             # Create context with REAL NASA data
             if nasa_data:
@@ -320,14 +336,13 @@ def enhance_prompt_with_nasa_data(messages: List[Dict[str, Any]]) -> List[Dict[s
                     "content": nasa_context
                 })
                 
-                print("🚀 Enhanced prompt with REAL NASA data")
                 return enhanced_messages
             else:
-                print("⚠️ No NASA data could be fetched")
+                trace.event("no NASA data could be fetched")
         
         return messages
     except Exception as e:
-        print(f"Error enhancing prompt with NASA data: {e}")
+        trace.event(f"error enhancing prompt with NASA data: {e}")
         return messages
 
 
@@ -348,7 +363,18 @@ def ensure_messages(messages: List[ChatMessage]) -> List[Dict[str, Any]]:
     return [{"role": msg.role, "content": msg.content} for msg in messages]
 
 
-def generate_reply(model: str, messages: List[Dict[str, Any]]) -> str:
+def record_usage(trace: Trace, resp: Any) -> None:
+    """Copy OpenAI token usage onto the trace, if the response reports it."""
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return
+    for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        value = getattr(usage, field, None)
+        if value is not None:
+            trace.tokens[field] = value
+
+
+def generate_reply(model: str, messages: List[Dict[str, Any]], trace: Trace) -> str:
     """Non-streaming: returns a single string with NASA data integration."""
     try:
         # Get the last user message
@@ -365,51 +391,77 @@ def generate_reply(model: str, messages: List[Dict[str, Any]]) -> str:
         space_keywords = extract_space_keywords(user_message)
         
         if space_keywords:
-            print(f"🛰️ Space question detected: {space_keywords}")
-            print("🤖 Using direct NASA API calls...")
-            
             # Use direct NASA API calls
-            enhanced_messages = enhance_prompt_with_nasa_data(messages)
+            enhanced_messages = enhance_prompt_with_nasa_data(messages, trace)
             mdl = normalize_model(model)
-            resp = client.chat.completions.create(
-                model=mdl,
-                messages=enhanced_messages,
-            )
+            with trace.stage("openai"):
+                resp = client.chat.completions.create(
+                    model=mdl,
+                    messages=enhanced_messages,
+                )
+            record_usage(trace, resp)
             return resp.choices[0].message.content or ""
         else:
             # Use regular OpenAI for non-space questions
             mdl = normalize_model(model)
-            resp = client.chat.completions.create(
-                model=mdl,
-                messages=messages,
-            )
+            with trace.stage("openai"):
+                resp = client.chat.completions.create(
+                    model=mdl,
+                    messages=messages,
+                )
+            record_usage(trace, resp)
             return resp.choices[0].message.content or ""
     except Exception as e:
+        trace.error = str(e)
         return f"Error generating reply: {e}"
 
 
-def stream_tokens_from_openai(model: str, messages: List[Dict[str, Any]]) -> Generator[bytes, None, None]:
+def stream_tokens_from_openai(model: str, messages: List[Dict[str, Any]], trace: Trace) -> Generator[bytes, None, None]:
     """
     Streaming generator with NASA data integration.
+    Submits the trace when the stream ends.
     """
     try:
         # Enhance messages with NASA data
-        enhanced_messages = enhance_prompt_with_nasa_data(messages)
+        enhanced_messages = enhance_prompt_with_nasa_data(messages, trace)
         
         mdl = normalize_model(model)
+        # Upstream time only: the clock is paused while the client consumes each yield
+        start = time.perf_counter()
         stream = client.chat.completions.create(
             model=mdl,
             messages=enhanced_messages,
             stream=True,
+            stream_options={"include_usage": True},
         )
-        for chunk in stream:
+        upstream = time.perf_counter() - start
+        trace.record("openai_create", upstream * 1000)
+        trace.stream_chunks = 0
+        chunks = iter(stream)
+        while True:
+            t0 = time.perf_counter()
+            chunk = next(chunks, None)
+            upstream += time.perf_counter() - t0
+            if chunk is None:
+                break
+            # The final usage chunk carries no choices
+            record_usage(trace, chunk)
+            if not chunk.choices:
+                continue
             delta = chunk.choices[0].delta
             if delta and getattr(delta, "content", None):
+                if trace.stream_chunks == 0:
+                    trace.record("openai_first_chunk", (time.perf_counter() - start) * 1000)
+                trace.stream_chunks += 1
                 yield delta.content.encode("utf-8")
+        trace.record("openai_upstream", upstream * 1000)
     except Exception as e:
         # Fallback: non-stream reply
-        text = f"(stream disabled fallback)\n{generate_reply(model, messages)}"
+        trace.event(f"stream failed, falling back: {e}")
+        text = f"(stream disabled fallback)\n{generate_reply(model, messages, trace)}"
         yield text.encode("utf-8")
+    finally:
+        trace_logger.submit(trace)
 
 
 # ---------------- FastAPI Routes ----------------
@@ -417,19 +469,36 @@ def stream_tokens_from_openai(model: str, messages: List[Dict[str, Any]]) -> Gen
 
 @app.get("/ask")
 def ask(question: str):
-    # Fetch data from NASA API
-    nasa_url = f"https://api.nasa.gov/planetary/apod?api_key={NASA_API_KEY}"
-    nasa_data = requests.get(nasa_url).json()
-
-    # Send to OpenAI model
-    completion = client.chat.completions.create(
-        model="gpt-5",
-        messages=[
-            {"role": "system", "content": "You are an AI that answers using NASA data when available."},
-            {"role": "user", "content": f"NASA data: {nasa_data}\nQuestion: {question}"}
-        ]
-    )
-    return {"answer": completion.choices[0].message.content}
+    trace = Trace("/ask")
+    try:
+        # Fetch data from NASA API
+        nasa_url = f"https://api.nasa.gov/planetary/apod?api_key={NASA_API_KEY}"
+        with trace.stage("nasa_apod"):
+            nasa_data = requests.get(nasa_url).json()
+        trace.source("apod")
+
+        # Send to OpenAI model
+        with trace.stage("openai"):
+            completion = client.chat.completions.create(
+                model="gpt-5",
+                messages=[
+                    {"role": "system", "content": "You are an AI that answers using NASA data when available."},
+                    {"role": "user", "content": f"NASA data: {nasa_data}\nQuestion: {question}"}
+                ]
+            )
+        record_usage(trace, completion)
+        return {"answer": completion.choices[0].message.content}
+    except Exception as e:
+        trace.error = str(e)
+        raise
+    finally:
+        trace_logger.submit(trace)
+
+@app.get("/api/logs/stats", response_model=Dict[str, int])
+async def trace_log_stats():
+    """Trace log counters: submitted, sampled out, dropped on overflow, written, queued."""
+    return trace_logger.stats()
+
 
 @app.get("/health", response_model=Dict[str, str])
 async def health():
@@ -494,27 +563,40 @@ async def nasa_space_weather():
 @app.post("/api/chat")
 async def chat_non_streaming(request: ChatRequest):
     """Non-streaming chat endpoint with NASA data integration."""
+    trace = Trace("/api/chat")
     try:
         messages = ensure_messages(request.messages)
         model = request.model or DEFAULT_MODEL
         
-        reply = generate_reply(model, messages)
+        reply = generate_reply(model, messages, trace)
         return {"reply": reply}
     except Exception as e:
+        trace.error = str(e)
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        trace_logger.submit(trace)
 
 @app.post("/api/chat/stream")
 async def chat_stream(request: ChatRequest):
-    """Streaming chat endpoint with NASA data integration."""
+    """
+    Streaming chat endpoint with NASA data integration.
+
+    The trace is submitted by the stream generator when it finishes. If the
+    client disconnects before the body starts, the generator never runs and
+    that request is not logged.
+    """
+    trace = Trace("/api/chat/stream")
     try:
         messages = ensure_messages(request.messages)
         model = request.model or DEFAULT_MODEL
         
         return StreamingResponse(
-            stream_tokens_from_openai(model, messages),
+            stream_tokens_from_openai(model, messages, trace),
             media_type="text/plain"
         )
     except Exception as e:
+        trace.error = str(e)
+        trace_logger.submit(trace)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -533,6 +615,7 @@ if __name__ == "__main__":
     print("   - /api/nasa/space-weather - Space weather alerts")
     print("   - /api/chat - Enhanced chat with NASA data")
     print("   - /api/chat/stream - Streaming chat with NASA data")
+    print("   - /api/logs/stats - Query/trace log counters")
     print(f"📚 API Documentation: http://localhost:{PORT}/docs")
     print(f"🌐 Server running on port {PORT}")
     
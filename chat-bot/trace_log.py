@@ -0,0 +1,225 @@
+"""
+Non-blocking query/trace logging for the chat backend.
+
+Request handlers build a Trace and hand it to TraceLogger.submit(), which only
+does a put_nowait() on a bounded queue. A background thread drains the queue
+in batches to a JSONL file or a SQLite `logs` table.
+- Sampling: only a fraction of traces are kept (TRACE_SAMPLE_RATE)
+- Overflow: when the queue is full the record is dropped and counted, never waited on
+
+Environment Variables:
+- TRACE_LOG_PATH: Output file; *.db / *.sqlite selects SQLite (default: logs/traces.jsonl)
+- TRACE_SAMPLE_RATE: Fraction of traces to keep, 0.0-1.0 (default: 1.0)
+- TRACE_QUEUE_SIZE: Max records buffered in memory (default: 10000)
+"""
+
+import json
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    request_id TEXT PRIMARY KEY,
+    route TEXT NOT NULL,
+    started_at DOUBLE PRECISION NOT NULL,
+    duration_ms DOUBLE PRECISION,
+    record TEXT NOT NULL
+)
+"""
+
+
+class Trace:
+    """Per-request record: intents, sources, stage timings, cache hits, tokens, events."""
+
+    def __init__(self, route: str, request_id: Optional[str] = None):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.route = route
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.intents: List[str] = []
+        self.sources: List[str] = []
+        self.timings_ms: Dict[str, float] = {}
+        # Reserved: NASA responses are not cached yet, so this stays empty until they are
+        self.cache_hits: Dict[str, bool] = {}
+        self.tokens: Dict[str, int] = {}
+        self.stream_chunks: Optional[int] = None
+        self.events: List[str] = []
+        self.error: Optional[str] = None
+        self.duration_ms: Optional[float] = None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a block of work; repeated stages accumulate."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def record(self, name: str, elapsed_ms: float) -> None:
+        """Add an externally measured duration to a stage."""
+        self.timings_ms[name] = self.timings_ms.get(name, 0.0) + elapsed_ms
+
+    def source(self, name: str) -> None:
+        if name not in self.sources:
+            self.sources.append(name)
+
+    def event(self, message: str) -> None:
+        self.events.append(message)
+
+    def finish(self) -> None:
+        if self.duration_ms is None:
+            self.duration_ms = (time.perf_counter() - self._start) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "route": self.route,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "intents": self.intents,
+            "sources": self.sources,
+            "timings_ms": self.timings_ms,
+            "cache_hits": self.cache_hits,
+            "tokens": self.tokens,
+            "stream_chunks": self.stream_chunks,
+            "events": self.events,
+            "error": self.error,
+        }
+
+
+class TraceLogger:
+    """Bounded queue + background batch writer. submit() never blocks."""
+
+    def __init__(
+        self,
+        path: str,
+        sample_rate: float = 1.0,
+        max_queue: int = 10000,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+    ):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.use_sqlite = path.endswith((".db", ".sqlite", ".sqlite3"))
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.counters = {"submitted": 0, "sampled_out": 0, "dropped": 0, "written": 0, "write_errors": 0}
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[key] += n
+
+    def submit(self, trace: Trace) -> None:
+        """Finish the trace and enqueue it; drops (and counts) on overflow."""
+        trace.finish()
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self._count("sampled_out")
+            return
+        try:
+            self._queue.put_nowait(trace.to_dict())
+            self._count("submitted")
+        except queue.Full:
+            self._count("dropped")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.counters)
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+    # ---------------- Background writer ----------------
+
+    def start(self) -> None:
+        """
+        Open the sink and start the writer thread.
+
+        The directory and file/database are opened here, so a bad TRACE_LOG_PATH
+        raises at startup instead of killing the writer thread silently.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.use_sqlite:
+            # Handed over to the writer thread, which is its only user from here on
+            sink: Any = sqlite3.connect(self.path, check_same_thread=False)
+            sink.execute(SQLITE_SCHEMA)
+            sink.commit()
+        else:
+            sink = open(self.path, "a", encoding="utf-8")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(sink,), name="trace-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Signal the writer to flush what is queued and exit."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self, sink: Any) -> None:
+        try:
+            while not self._stop.is_set():
+                batch = self._drain(block=True)
+                if batch:
+                    self._write(batch, sink)
+            # Final flush on shutdown
+            batch = self._drain(block=False)
+            while batch:
+                self._write(batch, sink)
+                batch = self._drain(block=False)
+        finally:
+            sink.close()
+
+    def _drain(self, block: bool) -> List[Dict[str, Any]]:
+        batch: List[Dict[str, Any]] = []
+        try:
+            if block:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _write(self, batch: List[Dict[str, Any]], sink: Any) -> None:
+        try:
+            if isinstance(sink, sqlite3.Connection):
+                sink.executemany(
+                    "INSERT OR REPLACE INTO logs (request_id, route, started_at, duration_ms, record) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (r["request_id"], r["route"], r["started_at"], r["duration_ms"], json.dumps(r))
+                        for r in batch
+                    ],
+                )
+                sink.commit()
+            else:
+                sink.write("".join(json.dumps(r) + "\n" for r in batch))
+                sink.flush()
+            self._count("written", len(batch))
+        except Exception:
+            self._count("write_errors", len(batch))
+
+
+def from_env() -> TraceLogger:
+    """Build a TraceLogger from TRACE_* environment variables."""
+    return TraceLogger(
+        path=os.getenv("TRACE_LOG_PATH", "logs/traces.jsonl"),
+        sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1.0")),
+        max_queue=int(os.getenv("TRACE_QUEUE_SIZE", "10000")),
+    )
@@ -0,0 +1,311 @@
+"""
+Materialized visibility score store.
+
+Scores are keyed by (location, time window) and recomputed only when one of
+their inputs changes:
+- Satellite inputs (cloud, aerosol, ...) are ingested per (tile, window) with a version
+- A new version marks only the locations in that tile/window dirty
+- refresh() rescores dirty rows; queries are plain indexed reads
+
+The schema sticks to types and upsert syntax shared by SQLite and PostgreSQL.
+"""
+
+import json
+import math
+import sqlite3
+import time
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from aethersense.spatial import Location
+
+# scorer(location, window, {source: payload}) -> score 0-100
+Scorer = Callable[[Location, str, Dict[str, Any]], float]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS locations (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    lat DOUBLE PRECISION NOT NULL,
+    lon DOUBLE PRECISION NOT NULL,
+    tile TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_locations_tile ON locations (tile);
+
+CREATE TABLE IF NOT EXISTS inputs (
+    source TEXT NOT NULL,
+    tile TEXT NOT NULL,
+    time_window TEXT NOT NULL,
+    version TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (tile, time_window, source)
+);
+
+CREATE TABLE IF NOT EXISTS scores (
+    location_id TEXT NOT NULL REFERENCES locations (id),
+    time_window TEXT NOT NULL,
+    score DOUBLE PRECISION NOT NULL,
+    input_versions TEXT NOT NULL,
+    computed_at DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (location_id, time_window)
+);
+CREATE INDEX IF NOT EXISTS idx_scores_window ON scores (time_window, score);
+
+CREATE TABLE IF NOT EXISTS dirty (
+    location_id TEXT NOT NULL,
+    time_window TEXT NOT NULL,
+    PRIMARY KEY (location_id, time_window)
+);
+"""
+
+
+def tile_for(lat: float, lon: float, tile_size_deg: float = 1.0) -> str:
+    """Grid tile key containing a point, e.g. '47:10' for 1-degree tiles."""
+    return f"{math.floor(lat / tile_size_deg)}:{math.floor(lon / tile_size_deg)}"
+
+
+class ScoreStore:
+    """
+    SQLite-backed score store with input-version tracking.
+
+    Usage:
+        store = ScoreStore("scores.db", scorer=compute_visibility)
+        store.add_locations(locations)
+        store.ingest("cloud", "S2-2025-10-25", [(tile, window, {"cloud_pct": 12})])
+        store.refresh()                       # only the touched tile/windows
+        store.scores_for_windows(weekend)     # indexed read
+    """
+
+    def __init__(self, path: str = ":memory:", scorer: Optional[Scorer] = None, tile_size_deg: float = 1.0):
+        self.scorer = scorer
+        self.tile_size_deg = tile_size_deg
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def tile_for(self, lat: float, lon: float) -> str:
+        return tile_for(lat, lon, self.tile_size_deg)
+
+    # ---------------- Writes ----------------
+
+    def add_locations(self, locations: Iterable[Location]) -> int:
+        """
+        Insert or update locations.
+
+        Only new locations, or ones whose coordinates changed, are marked dirty
+        for the windows their tile has inputs for. A location that moves to
+        another tile drops the scores and pending rows it no longer has inputs for.
+        """
+        marked = 0
+        with self.conn:
+            for loc in locations:
+                tile = self.tile_for(loc.lat, loc.lon)
+                existing = self.conn.execute(
+                    "SELECT lat, lon, tile FROM locations WHERE id = ?", (loc.id,)
+                ).fetchone()
+                self.conn.execute(
+                    """
+                    INSERT INTO locations (id, name, lat, lon, tile) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET
+                        name = excluded.name, lat = excluded.lat, lon = excluded.lon, tile = excluded.tile
+                    """,
+                    (loc.id, loc.name, loc.lat, loc.lon, tile),
+                )
+                if existing == (loc.lat, loc.lon, tile):
+                    continue
+                if existing is not None and existing[2] != tile:
+                    for table in ("scores", "dirty"):
+                        self.conn.execute(
+                            f"""
+                            DELETE FROM {table} WHERE location_id = ? AND time_window NOT IN (
+                                SELECT time_window FROM inputs WHERE tile = ?
+                            )
+                            """,
+                            (loc.id, tile),
+                        )
+                cursor = self.conn.execute(
+                    """
+                    INSERT INTO dirty (location_id, time_window)
+                    SELECT DISTINCT ?, time_window FROM inputs WHERE tile = ?
+                    ON CONFLICT DO NOTHING
+                    """,
+                    (loc.id, tile),
+                )
+                marked += cursor.rowcount
+        return marked
+
+    def ingest(self, source: str, version: str, entries: Iterable[Tuple[str, str, Any]]) -> int:
+        """
+        Record a granule or forecast for one source.
+
+        `entries` are (tile, window, payload) triples. Entries whose stored
+        version already equals `version` are ignored, so re-ingesting the same
+        granule is free. Returns the number of (location, window) rows newly
+        marked dirty.
+        """
+        changed: List[Tuple[str, str]] = []
+        with self.conn:
+            for tile, window, payload in entries:
+                row = self.conn.execute(
+                    "SELECT version FROM inputs WHERE tile = ? AND time_window = ? AND source = ?",
+                    (tile, window, source),
+                ).fetchone()
+                if row is not None and row[0] == version:
+                    continue
+                self.conn.execute(
+                    """
+                    INSERT INTO inputs (source, tile, time_window, version, payload) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (tile, time_window, source) DO UPDATE SET
+                        version = excluded.version, payload = excluded.payload
+                    """,
+                    (source, tile, window, version, json.dumps(payload)),
+                )
+                changed.append((tile, window))
+            cursor = self.conn.executemany(
+                """
+                INSERT INTO dirty (location_id, time_window)
+                SELECT id, ? FROM locations WHERE tile = ?
+                ON CONFLICT DO NOTHING
+                """,
+                [(window, tile) for tile, window in changed],
+            )
+        return cursor.rowcount
+
+    def refresh(self, limit: Optional[int] = None) -> int:
+        """
+        Recompute dirty scores (up to `limit`); returns how many were rescored.
+
+        Scoring runs outside any transaction. The results are written under
+        BEGIN IMMEDIATE, and a row is only written and cleared if its inputs
+        are unchanged since they were read. Rows re-dirtied by a concurrent
+        ingest stay pending for the next refresh. Rows whose tile/window has
+        no inputs are dropped without calling the scorer.
+        """
+        if self.scorer is None:
+            raise ValueError("ScoreStore.refresh() requires a scorer")
+        sql = """
+            SELECT l.id, l.name, l.lat, l.lon, l.tile, d.time_window
+            FROM dirty d JOIN locations l ON l.id = d.location_id
+            ORDER BY l.tile, d.time_window
+        """
+        params: Tuple[Any, ...] = ()
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = (limit,)
+        pending = self.conn.execute(sql, params).fetchall()
+
+        # Locations in the same tile/window share inputs; load each set once
+        inputs_cache: Dict[Tuple[str, str], Tuple[Dict[str, Any], str]] = {}
+        updates = []
+        empty = []
+        now = time.time()
+        for loc_id, name, lat, lon, tile, window in pending:
+            key = (tile, window)
+            if key not in inputs_cache:
+                inputs_cache[key] = self._load_inputs(tile, window)
+            inputs, versions = inputs_cache[key]
+            if not inputs:
+                empty.append((loc_id, window, tile))
+                continue
+            score = float(self.scorer(Location(id=loc_id, name=name, lat=lat, lon=lon), window, inputs))
+            updates.append((loc_id, window, tile, score, versions))
+
+        written = 0
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for loc_id, window, tile, score, versions in updates:
+                if self._current_versions(loc_id, window, tile) != versions:
+                    continue
+                self.conn.execute(
+                    """
+                    INSERT INTO scores (location_id, time_window, score, input_versions, computed_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (location_id, time_window) DO UPDATE SET
+                        score = excluded.score,
+                        input_versions = excluded.input_versions,
+                        computed_at = excluded.computed_at
+                    """,
+                    (loc_id, window, score, versions, now),
+                )
+                self.conn.execute(
+                    "DELETE FROM dirty WHERE location_id = ? AND time_window = ?", (loc_id, window)
+                )
+                written += 1
+            for loc_id, window, tile in empty:
+                if self._current_versions(loc_id, window, tile) != "{}":
+                    continue
+                for table in ("scores", "dirty"):
+                    self.conn.execute(
+                        f"DELETE FROM {table} WHERE location_id = ? AND time_window = ?", (loc_id, window)
+                    )
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        return written
+
+    def _load_inputs(self, tile: str, window: str) -> Tuple[Dict[str, Any], str]:
+        rows = self.conn.execute(
+            "SELECT source, version, payload FROM inputs WHERE tile = ? AND time_window = ? ORDER BY source",
+            (tile, window),
+        ).fetchall()
+        inputs = {source: json.loads(payload) for source, _, payload in rows}
+        versions = json.dumps({source: version for source, version, _ in rows}, sort_keys=True)
+        return inputs, versions
+
+    def _current_versions(self, location_id: str, window: str, tile: str) -> Optional[str]:
+        """Input versions for a location/window now, or None if the location left `tile`."""
+        row = self.conn.execute("SELECT tile FROM locations WHERE id = ?", (location_id,)).fetchone()
+        if row is None or row[0] != tile:
+            return None
+        rows = self.conn.execute(
+            "SELECT source, version FROM inputs WHERE tile = ? AND time_window = ?", (tile, window)
+        ).fetchall()
+        return json.dumps(dict(rows), sort_keys=True)
+
+    # ---------------- Reads ----------------
+
+    def dirty_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM dirty").fetchone()[0]
+
+    def get_score(self, location_id: str, window: str) -> Optional[float]:
+        row = self.conn.execute(
+            "SELECT score FROM scores WHERE location_id = ? AND time_window = ?",
+            (location_id, window),
+        ).fetchone()
+        return row[0] if row else None
+
+    def scores_for_location(self, location_id: str) -> Dict[str, float]:
+        rows = self.conn.execute(
+            "SELECT time_window, score FROM scores WHERE location_id = ? ORDER BY time_window",
+            (location_id,),
+        ).fetchall()
+        return dict(rows)
+
+    def scores_for_windows(self, windows: Iterable[str]) -> Dict[str, Dict[str, float]]:
+        """
+        Scores for the given windows as {location_id: {window: score}}.
+
+        The shape matches SpatialIndex.best_spots() so the two compose directly.
+        """
+        windows = list(windows)
+        result: Dict[str, Dict[str, float]] = {}
+        if not windows:
+            return result
+        placeholders = ", ".join("?" for _ in windows)
+        rows = self.conn.execute(
+            f"SELECT location_id, time_window, score FROM scores WHERE time_window IN ({placeholders})",
+            windows,
+        )
+        for loc_id, window, score in rows:
+            result.setdefault(loc_id, {})[window] = score
+        return result
+
+    def input_versions(self, location_id: str, window: str) -> Mapping[str, str]:
+        """Input versions the stored score was computed from (empty if unscored)."""
+        row = self.conn.execute(
+            "SELECT input_versions FROM scores WHERE location_id = ? AND time_window = ?",
+            (location_id, window),
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
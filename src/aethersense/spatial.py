@@ -0,0 +1,226 @@
+"""
+In-memory spatial index over scenic locations.
+
+Answers "best spot near me" queries without scoring every location:
+- KD-tree over unit-sphere coordinates (exact great-circle radius / k-nearest)
+- Top-k ranking over precomputed visibility scores per time window
+"""
+
+import heapq
+import math
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+@dataclass(frozen=True)
+class Location:
+    id: str
+    name: str
+    lat: float
+    lon: float
+
+
+@dataclass(frozen=True)
+class RankedSpot:
+    location: Location
+    window: str
+    score: float
+    distance_km: float
+
+
+def to_unit_vector(lat: float, lon: float) -> Tuple[float, float, float]:
+    """Project latitude/longitude (degrees) onto the unit sphere."""
+    phi = math.radians(lat)
+    lam = math.radians(lon)
+    cos_phi = math.cos(phi)
+    return (cos_phi * math.cos(lam), cos_phi * math.sin(lam), math.sin(phi))
+
+
+def chord_to_km(chord: float) -> float:
+    """Convert a unit-sphere chord length to great-circle distance in km."""
+    return 2.0 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2.0))
+
+
+def km_to_chord(distance_km: float) -> float:
+    """Convert great-circle distance in km to a unit-sphere chord length."""
+    angle = min(math.pi, distance_km / EARTH_RADIUS_KM)
+    return 2.0 * math.sin(angle / 2.0)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in km."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlam = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2) ** 2
+    return 2.0 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SpatialIndex:
+    """
+    Static KD-tree over a set of locations.
+
+    Points live in 3D unit-sphere space, so chord distance is monotonic with
+    great-circle distance and there is no seam at the antimeridian or poles.
+    The tree is stored in flat arrays (implicit median layout) to keep
+    construction and queries allocation-light.
+    """
+
+    def __init__(self, locations: Iterable[Location]):
+        self._locations: List[Location] = list(locations)
+        self._points: List[Tuple[float, float, float]] = [
+            to_unit_vector(loc.lat, loc.lon) for loc in self._locations
+        ]
+        # _order[i] is the location index stored at tree slot i; _axis[i] its split axis
+        self._order: List[int] = list(range(len(self._locations)))
+        self._axis: List[int] = [0] * len(self._locations)
+        self._build(0, len(self._order))
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    @property
+    def locations(self) -> Sequence[Location]:
+        return self._locations
+
+    def _build(self, lo: int, hi: int) -> None:
+        stack = [(lo, hi)]
+        points = self._points
+        order = self._order
+        while stack:
+            lo, hi = stack.pop()
+            if hi - lo <= 0:
+                continue
+            # Split on the axis with the widest spread
+            spans = []
+            for axis in range(3):
+                values = [points[order[i]][axis] for i in range(lo, hi)]
+                spans.append(max(values) - min(values))
+            axis = spans.index(max(spans))
+            segment = sorted(order[lo:hi], key=lambda idx: points[idx][axis])
+            order[lo:hi] = segment
+            mid = (lo + hi) // 2
+            self._axis[mid] = axis
+            stack.append((lo, mid))
+            stack.append((mid + 1, hi))
+
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> List[Tuple[Location, float]]:
+        """Return (location, distance_km) pairs within radius, nearest first."""
+        if not self._locations or radius_km < 0:
+            return []
+        query = to_unit_vector(lat, lon)
+        max_chord = km_to_chord(radius_km)
+        max_sq = max_chord * max_chord
+        points = self._points
+        order = self._order
+        axes = self._axis
+        found: List[Tuple[float, int]] = []
+
+        stack = [(0, len(order))]
+        while stack:
+            lo, hi = stack.pop()
+            if hi <= lo:
+                continue
+            mid = (lo + hi) // 2
+            idx = order[mid]
+            p = points[idx]
+            dx, dy, dz = p[0] - query[0], p[1] - query[1], p[2] - query[2]
+            dist_sq = dx * dx + dy * dy + dz * dz
+            if dist_sq <= max_sq:
+                found.append((dist_sq, idx))
+            axis = axes[mid]
+            diff = query[axis] - p[axis]
+            if diff <= 0:
+                stack.append((lo, mid))
+                if diff * diff <= max_sq:
+                    stack.append((mid + 1, hi))
+            else:
+                stack.append((mid + 1, hi))
+                if diff * diff <= max_sq:
+                    stack.append((lo, mid))
+
+        found.sort()
+        return [(self._locations[idx], chord_to_km(math.sqrt(d))) for d, idx in found]
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> List[Tuple[Location, float]]:
+        """Return the k nearest (location, distance_km) pairs, nearest first."""
+        if k <= 0 or not self._locations:
+            return []
+        query = to_unit_vector(lat, lon)
+        points = self._points
+        order = self._order
+        axes = self._axis
+        # Max-heap of (-dist_sq, idx) holding the current best k
+        best: List[Tuple[float, int]] = []
+
+        def search(lo: int, hi: int) -> None:
+            if hi <= lo:
+                return
+            mid = (lo + hi) // 2
+            idx = order[mid]
+            p = points[idx]
+            dx, dy, dz = p[0] - query[0], p[1] - query[1], p[2] - query[2]
+            dist_sq = dx * dx + dy * dy + dz * dz
+            if len(best) < k:
+                heapq.heappush(best, (-dist_sq, idx))
+            elif dist_sq < -best[0][0]:
+                heapq.heapreplace(best, (-dist_sq, idx))
+            axis = axes[mid]
+            diff = query[axis] - p[axis]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff <= 0 else ((mid + 1, hi), (lo, mid))
+            search(*near)
+            if len(best) < k or diff * diff < -best[0][0]:
+                search(*far)
+
+        search(0, len(order))
+        ranked = sorted((-neg, idx) for neg, idx in best)
+        return [(self._locations[idx], chord_to_km(math.sqrt(d))) for d, idx in ranked]
+
+    def best_spots(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        scores: Mapping[str, Mapping[str, float]],
+        k: int = 3,
+        windows: Optional[Iterable[str]] = None,
+    ) -> List[RankedSpot]:
+        """
+        Rank the top-k (location, time window) pairs within radius.
+
+        `scores` maps location id -> {window key -> visibility score 0-100}.
+        `windows` optionally restricts which window keys are considered
+        (e.g. only this weekend). Ties on score prefer the closer location.
+        """
+        if k <= 0:
+            return []
+        allowed = set(windows) if windows is not None else None
+        heap: List[Tuple[float, float, str, str]] = []
+        candidates: Dict[str, Tuple[Location, float]] = {}
+
+        for loc, distance in self.within_radius(lat, lon, radius_km):
+            per_window = scores.get(loc.id)
+            if not per_window:
+                continue
+            candidates[loc.id] = (loc, distance)
+            for window, score in per_window.items():
+                if allowed is not None and window not in allowed:
+                    continue
+                entry = (score, -distance, loc.id, window)
+                if len(heap) < k:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+
+        heap.sort(reverse=True)
+        return [
+            RankedSpot(
+                location=candidates[loc_id][0],
+                window=window,
+                score=score,
+                distance_km=candidates[loc_id][1],
+            )
+            for score, _, loc_id, window in heap
+        ]
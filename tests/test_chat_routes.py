@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("openai")
+
+
+@pytest.fixture
+def main(monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("TRACE_LOG_PATH", str(tmp_path / "traces.jsonl"))
+    import main as chat_main
+    submitted = []
+    monkeypatch.setattr(chat_main.trace_logger, "submit", submitted.append)
+    chat_main.submitted = submitted
+    return chat_main
+
+
+class BrokenRequest:
+    model = None
+
+    @property
+    def messages(self):
+        raise ValueError("bad messages")
+
+
+def test_chat_logs_trace_when_request_fails(main):
+    with pytest.raises(main.HTTPException):
+        asyncio.run(main.chat_non_streaming(BrokenRequest()))
+    assert [t.route for t in main.submitted] == ["/api/chat"]
+    assert main.submitted[0].error == "bad messages"
+
+
+def test_chat_stream_logs_trace_when_request_fails(main):
+    with pytest.raises(main.HTTPException):
+        asyncio.run(main.chat_stream(BrokenRequest()))
+    assert [t.route for t in main.submitted] == ["/api/chat/stream"]
+
+
+def test_chat_logs_trace_on_success(main, monkeypatch):
+    monkeypatch.setattr(main, "generate_reply", lambda model, messages, trace: "hi")
+    request = main.ChatRequest(messages=[main.ChatMessage(role="user", content="hello")])
+    assert asyncio.run(main.chat_non_streaming(request)) == {"reply": "hi"}
+    assert [t.route for t in main.submitted] == ["/api/chat"]
+    assert main.submitted[0].error is None
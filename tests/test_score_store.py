@@ -0,0 +1,181 @@
+import pytest
+
+from aethersense.score_store import ScoreStore
+from aethersense.spatial import Location
+
+FUSSEN = Location("fussen", "Füssen", 47.5, 10.7)
+NEUSCHWANSTEIN = Location("neuschwanstein", "Neuschwanstein", 47.56, 10.75)
+PLITVICE = Location("plitvice", "Plitvice", 44.88, 15.6)
+
+
+def cloud_scorer(calls):
+    def scorer(location, window, inputs):
+        calls.append((location.id, window))
+        return 100.0 - inputs["cloud"]["pct"]
+    return scorer
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def store(calls):
+    store = ScoreStore(scorer=cloud_scorer(calls))
+    store.add_locations([FUSSEN, NEUSCHWANSTEIN, PLITVICE])
+    yield store
+    store.close()
+
+
+def alps(store):
+    return store.tile_for(FUSSEN.lat, FUSSEN.lon)
+
+
+def croatia(store):
+    return store.tile_for(PLITVICE.lat, PLITVICE.lon)
+
+
+def test_ingest_dirties_only_touched_tile_and_window(store, calls):
+    assert store.ingest("cloud", "v1", [(alps(store), "sat", {"pct": 10})]) == 2
+    assert store.refresh() == 2
+    assert sorted(calls) == [("fussen", "sat"), ("neuschwanstein", "sat")]
+    assert store.get_score("fussen", "sat") == 90.0
+    assert store.get_score("plitvice", "sat") is None
+
+    calls.clear()
+    store.ingest("cloud", "v1", [(croatia(store), "sat", {"pct": 40})])
+    assert store.ingest("cloud", "v2", [(alps(store), "sun", {"pct": 0})]) == 2
+    store.refresh()
+    assert sorted(calls) == [("fussen", "sun"), ("neuschwanstein", "sun"), ("plitvice", "sat")]
+
+
+def test_reingesting_same_version_is_noop(store, calls):
+    store.ingest("cloud", "v1", [(alps(store), "sat", {"pct": 10})])
+    store.refresh()
+    calls.clear()
+    assert store.ingest("cloud", "v1", [(alps(store), "sat", {"pct": 10})]) == 0
+    assert store.refresh() == 0
+    assert calls == []
+
+
+def test_upserting_unchanged_locations_does_not_dirty(store, calls):
+    store.ingest("cloud", "v1", [(alps(store), "sat", {"pct": 10}), (alps(store), "sun", {"pct": 20})])
+    store.refresh()
+    assert store.add_locations([FUSSEN, NEUSCHWANSTEIN, PLITVICE]) == 0
+    assert store.add_locations([Location("fussen", "Füssen (town)", FUSSEN.lat, FUSSEN.lon)]) == 0
+    assert store.add_locations([Location("fussen", "Füssen", 47.51, 10.7)]) == 2
+
+
+def test_multiple_sources_tracked_in_input_versions(store):
+    tile = alps(store)
+    store.ingest("cloud", "S2-001", [(tile, "sat", {"pct": 10})])
+    store.ingest("aerosol", "S5P-042", [(tile, "sat", {"index": 0.3})])
+    store.refresh()
+    assert store.input_versions("fussen", "sat") == {"aerosol": "S5P-042", "cloud": "S2-001"}
+
+    store.ingest("aerosol", "S5P-043", [(tile, "sat", {"index": 0.1})])
+    assert store.dirty_count() == 2
+    store.refresh()
+    assert store.input_versions("fussen", "sat") == {"aerosol": "S5P-043", "cloud": "S2-001"}
+
+
+def test_refresh_limit(store):
+    store.ingest("cloud", "v1", [(alps(store), w, {"pct": 10}) for w in ("sat", "sun", "mon")])
+    assert store.dirty_count() == 6
+    assert store.refresh(limit=4) == 4
+    assert store.dirty_count() == 2
+    assert store.refresh(limit=4) == 2
+    assert store.dirty_count() == 0
+
+
+def test_scores_for_windows_shape(store):
+    store.ingest("cloud", "v1", [(alps(store), "sat", {"pct": 10}), (croatia(store), "sun", {"pct": 30})])
+    store.refresh()
+    assert store.scores_for_windows(["sat", "sun"]) == {
+        "fussen": {"sat": 90.0},
+        "neuschwanstein": {"sat": 90.0},
+        "plitvice": {"sun": 70.0},
+    }
+    assert store.scores_for_windows([]) == {}
+
+
+def test_moving_location_drops_old_tile_rows(store, calls):
+    store.ingest("cloud", "v1", [(alps(store), "sat", {"pct": 10}), (alps(store), "sun", {"pct": 20})])
+    store.refresh()
+    store.ingest("cloud", "v2", [(alps(store), "sun", {"pct": 50})])
+    assert store.dirty_count() == 2
+
+    # Move to a tile with no inputs at all
+    assert store.add_locations([Location("fussen", "Füssen", 60.0, 5.0)]) == 0
+    assert store.get_score("fussen", "sat") is None
+    assert store.input_versions("fussen", "sat") == {}
+    assert store.scores_for_location("fussen") == {}
+    assert store.refresh() == 1
+    assert store.dirty_count() == 0
+
+    # Move into a tile that has inputs for one window only
+    store.ingest("cloud", "v1", [(croatia(store), "sat", {"pct": 40})])
+    assert store.add_locations([Location("fussen", "Füssen", 44.9, 15.7)]) == 1
+    store.refresh()
+    assert store.scores_for_location("fussen") == {"sat": 60.0}
+
+
+def test_refresh_skips_rows_without_inputs(store, calls):
+    store.ingest("cloud", "v1", [(alps(store), "sat", {"pct": 10})])
+    # Simulate a row queued for a window whose inputs have since disappeared
+    store.conn.execute("DELETE FROM inputs")
+    store.conn.commit()
+    assert store.refresh() == 0
+    assert calls == []
+    assert store.dirty_count() == 0
+
+
+def test_concurrent_ingest_during_refresh_keeps_row_dirty(tmp_path):
+    path = str(tmp_path / "scores.db")
+    ingester = ScoreStore(path)
+    ingester.add_locations([FUSSEN])
+    tile = ingester.tile_for(FUSSEN.lat, FUSSEN.lon)
+    ingester.ingest("cloud", "v1", [(tile, "sat", {"pct": 10})])
+
+    def scorer(location, window, inputs):
+        # A new granule lands from another process while this one is scoring
+        ingester.ingest("cloud", "v2", [(tile, "sat", {"pct": 30})])
+        return 100.0 - inputs["cloud"]["pct"]
+
+    refresher = ScoreStore(path, scorer=scorer)
+    assert refresher.refresh() == 0
+    assert refresher.dirty_count() == 1
+    assert refresher.get_score("fussen", "sat") is None
+
+    refresher.scorer = lambda location, window, inputs: 100.0 - inputs["cloud"]["pct"]
+    assert refresher.refresh() == 1
+    assert refresher.get_score("fussen", "sat") == 70.0
+    assert refresher.input_versions("fussen", "sat") == {"cloud": "v2"}
+    ingester.close()
+    refresher.close()
+
+
+def test_refresh_requires_scorer():
+    with pytest.raises(ValueError):
+        ScoreStore().refresh()
+
+
+def test_ingest_count_is_exact_when_refresh_interleaves(tmp_path):
+    path = str(tmp_path / "scores.db")
+    ingester = ScoreStore(path)
+    ingester.add_locations([FUSSEN, NEUSCHWANSTEIN])
+    tile = ingester.tile_for(FUSSEN.lat, FUSSEN.lon)
+    assert ingester.ingest("cloud", "v1", [(tile, "sat", {"pct": 10})]) == 2
+
+    refresher = ScoreStore(path, scorer=lambda location, window, inputs: 100.0 - inputs["cloud"]["pct"])
+
+    def entries():
+        # Another process clears the pending rows while this ingest is under way
+        assert refresher.refresh() == 2
+        yield (tile, "sat", {"pct": 30})
+
+    assert ingester.ingest("cloud", "v2", entries()) == 2
+    assert ingester.dirty_count() == 2
+    ingester.close()
+    refresher.close()
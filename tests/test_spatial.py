@@ -0,0 +1,99 @@
+import random
+
+import pytest
+
+from aethersense.spatial import Location, SpatialIndex, haversine_km
+
+
+def brute_nearest(locations, lat, lon, k):
+    return [loc.id for loc in sorted(locations, key=lambda l: haversine_km(lat, lon, l.lat, l.lon))[:k]]
+
+
+def brute_radius(locations, lat, lon, radius_km):
+    return {loc.id for loc in locations if haversine_km(lat, lon, loc.lat, loc.lon) <= radius_km}
+
+
+@pytest.fixture(scope="module")
+def world():
+    rng = random.Random(7)
+    locations = [Location(id=str(i), name="", lat=rng.uniform(-90, 90), lon=rng.uniform(-180, 180)) for i in range(2000)]
+    # Clusters straddling the antimeridian and near both poles
+    for i in range(50):
+        locations.append(Location(id=f"am{i}", name="", lat=rng.uniform(-5, 5), lon=rng.choice([-1, 1]) * rng.uniform(179.0, 180.0)))
+        locations.append(Location(id=f"np{i}", name="", lat=rng.uniform(89.0, 90.0), lon=rng.uniform(-180, 180)))
+        locations.append(Location(id=f"sp{i}", name="", lat=rng.uniform(-90.0, -89.0), lon=rng.uniform(-180, 180)))
+    return locations, SpatialIndex(locations)
+
+
+QUERY_POINTS = [(0.0, 179.9), (0.0, -179.9), (89.9, 0.0), (-89.9, 120.0), (90.0, 0.0), (47.5, 10.7)]
+
+
+@pytest.mark.parametrize("lat,lon", QUERY_POINTS)
+def test_nearest_matches_brute_force(world, lat, lon):
+    locations, index = world
+    got = index.nearest(lat, lon, k=10)
+    assert [loc.id for loc, _ in got] == brute_nearest(locations, lat, lon, 10)
+    for loc, distance in got:
+        assert distance == pytest.approx(haversine_km(lat, lon, loc.lat, loc.lon), abs=1e-6)
+
+
+@pytest.mark.parametrize("lat,lon", QUERY_POINTS)
+def test_within_radius_matches_brute_force(world, lat, lon):
+    locations, index = world
+    got = index.within_radius(lat, lon, 300.0)
+    assert {loc.id for loc, _ in got} == brute_radius(locations, lat, lon, 300.0)
+    distances = [d for _, d in got]
+    assert distances == sorted(distances)
+
+
+def test_random_queries_match_brute_force(world):
+    locations, index = world
+    rng = random.Random(11)
+    for _ in range(100):
+        lat, lon = rng.uniform(-90, 90), rng.uniform(-180, 180)
+        assert [loc.id for loc, _ in index.nearest(lat, lon, k=5)] == brute_nearest(locations, lat, lon, 5)
+        assert {loc.id for loc, _ in index.within_radius(lat, lon, 500.0)} == brute_radius(locations, lat, lon, 500.0)
+
+
+def test_antimeridian_neighbours_found_across_seam():
+    index = SpatialIndex([Location("east", "", 0.0, 179.95), Location("west", "", 0.0, -179.95), Location("far", "", 0.0, 170.0)])
+    ids = {loc.id for loc, _ in index.within_radius(0.0, 180.0, 20.0)}
+    assert ids == {"east", "west"}
+
+
+def test_empty_index():
+    index = SpatialIndex([])
+    assert len(index) == 0
+    assert index.nearest(0.0, 0.0, k=3) == []
+    assert index.within_radius(0.0, 0.0, 100.0) == []
+    assert index.best_spots(0.0, 0.0, 100.0, {}, k=3) == []
+
+
+def test_non_positive_k_and_negative_radius(world):
+    _, index = world
+    assert index.nearest(0.0, 0.0, k=0) == []
+    assert index.nearest(0.0, 0.0, k=-1) == []
+    assert index.within_radius(0.0, 0.0, -1.0) == []
+    assert index.best_spots(0.0, 0.0, 100.0, {}, k=0) == []
+
+
+def test_k_larger_than_index_returns_everything():
+    locations = [Location(str(i), "", float(i), float(i)) for i in range(4)]
+    got = SpatialIndex(locations).nearest(0.0, 0.0, k=10)
+    assert [loc.id for loc, _ in got] == ["0", "1", "2", "3"]
+
+
+def test_best_spots_ranks_by_score_then_distance():
+    near = Location("near", "", 47.5, 10.7)
+    far = Location("far", "", 47.6, 10.9)
+    outside = Location("outside", "", 52.0, 13.0)
+    index = SpatialIndex([near, far, outside])
+    scores = {
+        "near": {"sat": 80.0, "sun": 90.0},
+        "far": {"sat": 90.0, "sun": 95.0},
+        "outside": {"sat": 100.0},
+    }
+    got = index.best_spots(47.5, 10.7, 100.0, scores, k=3)
+    assert [(s.location.id, s.window) for s in got] == [("far", "sun"), ("near", "sun"), ("far", "sat")]
+    got = index.best_spots(47.5, 10.7, 100.0, scores, k=2, windows=["sat"])
+    assert [(s.location.id, s.window) for s in got] == [("far", "sat"), ("near", "sat")]
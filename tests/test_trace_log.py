@@ -0,0 +1,96 @@
+import json
+import sqlite3
+
+import pytest
+
+from trace_log import Trace, TraceLogger
+
+
+def make_trace(route="/api/chat"):
+    trace = Trace(route)
+    trace.intents = ["mars"]
+    trace.source("mars_weather")
+    with trace.stage("nasa_mars_weather"):
+        pass
+    trace.tokens["total_tokens"] = 42
+    return trace
+
+
+def test_overflow_drops_and_counts_without_blocking(tmp_path):
+    logger = TraceLogger(str(tmp_path / "traces.jsonl"), max_queue=5)
+    for _ in range(8):
+        logger.submit(make_trace())
+    stats = logger.stats()
+    assert stats["submitted"] == 5
+    assert stats["dropped"] == 3
+    assert stats["queued"] == 5
+
+
+def test_sample_rate_zero_samples_everything_out(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    logger = TraceLogger(str(path), sample_rate=0.0)
+    logger.start()
+    for _ in range(10):
+        logger.submit(make_trace())
+    logger.stop()
+    stats = logger.stats()
+    assert stats["sampled_out"] == 10
+    assert stats["submitted"] == 0
+    assert stats["written"] == 0
+    assert path.read_text() == ""
+
+
+def test_stop_flushes_batches_to_jsonl(tmp_path):
+    path = tmp_path / "logs" / "traces.jsonl"
+    logger = TraceLogger(str(path), batch_size=3, flush_interval=0.05)
+    logger.start()
+    traces = [make_trace() for _ in range(7)]
+    for trace in traces:
+        logger.submit(trace)
+    logger.stop()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r["request_id"] for r in records] == [t.request_id for t in traces]
+    assert records[0]["sources"] == ["mars_weather"]
+    assert records[0]["tokens"] == {"total_tokens": 42}
+    assert "nasa_mars_weather" in records[0]["timings_ms"]
+    assert records[0]["duration_ms"] is not None
+    assert logger.stats()["written"] == 7
+
+
+def test_stop_flushes_batches_to_sqlite(tmp_path):
+    path = tmp_path / "traces.db"
+    logger = TraceLogger(str(path), batch_size=2, flush_interval=0.05)
+    logger.start()
+    for _ in range(5):
+        logger.submit(make_trace("/ask"))
+    logger.stop()
+
+    conn = sqlite3.connect(str(path))
+    rows = conn.execute("SELECT route, record FROM logs").fetchall()
+    conn.close()
+    assert len(rows) == 5
+    assert {route for route, _ in rows} == {"/ask"}
+    assert json.loads(rows[0][1])["intents"] == ["mars"]
+    assert logger.stats()["written"] == 5
+
+
+def test_stage_and_record_accumulate():
+    trace = Trace("/api/chat/stream")
+    trace.record("openai_upstream", 10.0)
+    trace.record("openai_upstream", 5.0)
+    assert trace.timings_ms["openai_upstream"] == 15.0
+
+
+@pytest.mark.parametrize("name", ["traces.jsonl", "traces.db"])
+def test_unusable_path_fails_at_start(tmp_path, name):
+    not_a_dir = tmp_path / "file"
+    not_a_dir.write_text("")
+    logger = TraceLogger(str(not_a_dir / name))
+    with pytest.raises(OSError):
+        logger.start()
+    assert logger._thread is None
+
+
+def test_unused_cache_hits_is_empty():
+    assert make_trace().to_dict()["cache_hits"] == {}